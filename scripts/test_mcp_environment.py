@@ -23,12 +23,13 @@ Exit codes:
 
 import argparse
 import json
+import os
 import sys
-import requests
+from collections import defaultdict
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any
 from urllib.parse import urlparse
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 
 
@@ -40,22 +41,45 @@ class CheckStatus(Enum):
     SKIP = "SKIP"
 
 
-@dataclass
+# Workspace root, resolved once (resolve() stats the path to follow symlinks)
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Directories skipped when counting workspace entries - .git alone can hold
+# 100K+ inodes on a real repo and tells us nothing about accessibility
+_SKIP_DIRS = {
+    '.git', 'node_modules', '__pycache__', '.venv', 'venv',
+    'dist', 'build', '.mypy_cache', '.pytest_cache'
+}
+
+
+def _count_entries(root: Path) -> int:
+    """Count files/directories under root, pruning heavyweight directories."""
+    total = 0
+    for dirpath, dirs, files in os.walk(root, topdown=True, followlinks=False):
+        dirs[:] = [d for d in dirs if d not in _SKIP_DIRS]
+        total += len(dirs) + len(files)
+    return total
+
+
+# Status -> display symbol, built once instead of per __str__ call
+_STATUS_SYMBOL = {
+    CheckStatus.PASS: "[OK]",
+    CheckStatus.FAIL: "[FAIL]",
+    CheckStatus.WARN: "[WARN]",
+    CheckStatus.SKIP: "[SKIP]"
+}
+
+
+@dataclass(frozen=True)
 class CheckResult:
-    """Result of a single check."""
+    """Result of a single check (immutable; use dataclasses.replace to derive)."""
     name: str
     status: CheckStatus
     message: str
     details: Optional[str] = None
-    
+
     def __str__(self) -> str:
-        status_symbols = {
-            CheckStatus.PASS: "[OK]",
-            CheckStatus.FAIL: "[FAIL]",
-            CheckStatus.WARN: "[WARN]",
-            CheckStatus.SKIP: "[SKIP]"
-        }
-        symbol = status_symbols.get(self.status, "[?]")
+        symbol = _STATUS_SYMBOL.get(self.status, "[?]")
         result = f"  {symbol} {self.name}: {self.message}"
         if self.details:
             result += f"\n      {self.details}"
@@ -64,44 +88,80 @@ class CheckResult:
 
 class ServiceChecker:
     """Base class for service health checks (Open/Closed Principle)."""
-    
+
+    # Message templates; subclasses override to customize wording/hints
+    display_name: Optional[str] = None
+    conn_message = "Service not reachable at {url}"
+    conn_details: Optional[str] = "Ensure service is running (e.g., docker-compose up)"
+    timeout_message = "Service timeout at {url}"
+    timeout_details: Optional[str] = "Service may be overloaded or unreachable"
+    error_message = "Unexpected error: {error}"
+
+    def _name(self) -> str:
+        return self.display_name or self.__class__.__name__
+
+    def _classify_failure(self, url: str, error: Exception) -> CheckResult:
+        """Map a requests failure to a CheckResult (single except tree)."""
+        import requests
+
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return CheckResult(
+                name=self._name(),
+                status=CheckStatus.FAIL,
+                message=self.conn_message.format(url=url),
+                details=self.conn_details
+            )
+        if isinstance(error, requests.exceptions.Timeout):
+            return CheckResult(
+                name=self._name(),
+                status=CheckStatus.FAIL,
+                message=self.timeout_message.format(url=url),
+                details=self.timeout_details
+            )
+        return CheckResult(
+            name=self._name(),
+            status=CheckStatus.FAIL,
+            message=self.error_message.format(error=error)
+        )
+
     def check(self, url: str, timeout: int = 2) -> CheckResult:
         """Check if service is reachable."""
+        # Deferred so --help and config-discovery failures never pay the
+        # requests/urllib3 import cost (cached after the first call)
+        import requests
+
         try:
             response = requests.get(url, timeout=timeout)
             response.raise_for_status()
             return CheckResult(
-                name=self.__class__.__name__,
+                name=self._name(),
                 status=CheckStatus.PASS,
                 message=f"Service responding at {url}"
             )
-        except requests.exceptions.ConnectionError:
-            return CheckResult(
-                name=self.__class__.__name__,
-                status=CheckStatus.FAIL,
-                message=f"Service not reachable at {url}",
-                details="Ensure service is running (e.g., docker-compose up)"
-            )
-        except requests.exceptions.Timeout:
-            return CheckResult(
-                name=self.__class__.__name__,
-                status=CheckStatus.FAIL,
-                message=f"Service timeout at {url}",
-                details="Service may be overloaded or unreachable"
-            )
+        except requests.RequestException as e:
+            return self._classify_failure(url, e)
         except Exception as e:
             return CheckResult(
-                name=self.__class__.__name__,
+                name=self._name(),
                 status=CheckStatus.FAIL,
-                message=f"Unexpected error: {str(e)}"
+                message=self.error_message.format(error=e)
             )
 
 
 class OllamaChecker(ServiceChecker):
     """Check Ollama service health."""
-    
+
+    display_name = "Ollama"
+    conn_message = "Not reachable at {url}"
+    conn_details = "Start with: docker-compose up ollama (or ollama serve)"
+    error_message = "Error: {error}"
+
     def check(self, url: str, timeout: int = 2) -> CheckResult:
         """Check Ollama with model list endpoint."""
+        # Deferred so --help and config-discovery failures never pay the
+        # requests/urllib3 import cost (cached after the first call)
+        import requests
+
         try:
             response = requests.get(f"{url}/api/tags", timeout=timeout)
             response.raise_for_status()
@@ -114,13 +174,8 @@ class OllamaChecker(ServiceChecker):
                 message=f"Running at {url}",
                 details=f"{model_count} model(s) available"
             )
-        except requests.exceptions.ConnectionError:
-            return CheckResult(
-                name="Ollama",
-                status=CheckStatus.FAIL,
-                message=f"Not reachable at {url}",
-                details="Start with: docker-compose up ollama (or ollama serve)"
-            )
+        except requests.RequestException as e:
+            return self._classify_failure(url, e)
         except Exception as e:
             return CheckResult(
                 name="Ollama",
@@ -131,9 +186,18 @@ class OllamaChecker(ServiceChecker):
 
 class QdrantChecker(ServiceChecker):
     """Check Qdrant service health."""
-    
+
+    display_name = "Qdrant"
+    conn_message = "Not reachable at {url}"
+    conn_details = "Start with: docker-compose up qdrant"
+    error_message = "Error: {error}"
+
     def check(self, url: str, timeout: int = 2) -> CheckResult:
         """Check Qdrant with collections endpoint."""
+        # Deferred so --help and config-discovery failures never pay the
+        # requests/urllib3 import cost (cached after the first call)
+        import requests
+
         try:
             response = requests.get(f"{url}/collections", timeout=timeout)
             response.raise_for_status()
@@ -146,13 +210,8 @@ class QdrantChecker(ServiceChecker):
                 message=f"Running at {url}",
                 details=f"{collection_count} collection(s) available"
             )
-        except requests.exceptions.ConnectionError:
-            return CheckResult(
-                name="Qdrant",
-                status=CheckStatus.FAIL,
-                message=f"Not reachable at {url}",
-                details="Start with: docker-compose up qdrant"
-            )
+        except requests.RequestException as e:
+            return self._classify_failure(url, e)
         except Exception as e:
             return CheckResult(
                 name="Qdrant",
@@ -219,10 +278,12 @@ class MCPConfigDiscoverer:
         
         return dependencies
     
-    def get_all_dependencies(self) -> Dict[str, str]:
-        """Get all unique service dependencies across all servers."""
+    def get_all_dependencies(self, server_filter: Optional[str] = None) -> Dict[str, str]:
+        """Get all unique service dependencies across all (or filtered) servers."""
         all_deps = {}
         for server_name in self.servers.keys():
+            if server_filter and server_filter.lower() not in server_name.lower():
+                continue
             deps = self.get_server_dependencies(server_name)
             all_deps.update(deps)
         return all_deps
@@ -250,22 +311,31 @@ class MCPEnvironmentTester:
             return False, results
         
         # Step 2: Check service dependencies
-        all_deps = self.discoverer.get_all_dependencies()
-        
+        # Group by URL so aliases (e.g. OLLAMA_URL and LLM_URL pointing at the
+        # same endpoint) are probed once and the result is cloned per alias.
+        all_deps = self.discoverer.get_all_dependencies(server_filter)
+
+        url_to_names: Dict[str, List[str]] = defaultdict(list)
         for service_name, service_url in all_deps.items():
-            # Map service names to checkers
-            checker_name = service_name.lower()
-            
+            url_to_names[service_url].append(service_name)
+
+        for service_url, service_names in url_to_names.items():
+            primary = service_names[0]
+            checker_name = primary.lower()
+
             if checker_name in self.checkers:
                 checker = self.checkers[checker_name]
                 result = checker.check(service_url)
-                results.append(result)
             else:
                 # Generic HTTP check for unknown services
                 generic_checker = ServiceChecker()
                 result = generic_checker.check(service_url)
-                result.name = service_name.title()
-                results.append(result)
+                result = replace(result, name=primary.title())
+            results.append(result)
+
+            # Remaining names share the URL - reuse the probe result
+            for alias in service_names[1:]:
+                results.append(replace(result, name=alias.title()))
         
         # Step 3: Check server configurations
         servers_to_check = self.discoverer.servers.keys()
@@ -330,32 +400,35 @@ class MCPEnvironmentTester:
         server = self.discoverer.servers.get(server_name, {})
         args = server.get("args", [])
         
-        # Find workspace argument
-        workspace_path = None
+        # Find workspace argument (keep the raw string; only build a Path
+        # once we know it isn't a Cursor placeholder)
+        raw_workspace = None
         for i, arg in enumerate(args):
             if arg == "--workspace" and i + 1 < len(args):
-                workspace_path = Path(args[i + 1])
+                raw_workspace = args[i + 1]
                 break
-        
-        if not workspace_path:
+
+        if not raw_workspace:
             return CheckResult(
                 name=f"Workspace: {server_name}",
                 status=CheckStatus.SKIP,
                 message="No workspace path found in args"
             )
-        
+
         # Handle ${workspaceFolder} variable (would need Cursor context to resolve)
-        if "${workspaceFolder}" in str(workspace_path):
+        if "${workspaceFolder}" in raw_workspace:
             return CheckResult(
                 name=f"Workspace: {server_name}",
                 status=CheckStatus.SKIP,
                 message="Workspace path uses ${workspaceFolder} variable",
                 details="Path will be resolved by Cursor at runtime"
             )
-        
+
+        workspace_path = Path(raw_workspace)
+
         if workspace_path.exists():
             try:
-                file_count = len(list(workspace_path.rglob("*")))
+                file_count = _count_entries(workspace_path)
                 return CheckResult(
                     name=f"Workspace: {server_name}",
                     status=CheckStatus.PASS,
@@ -411,53 +484,55 @@ Examples:
     args = parser.parse_args()
     
     # Find workspace root
-    script_path = Path(__file__).resolve()
-    workspace_root = script_path.parent.parent
-    config_path = workspace_root / args.config
+    config_path = _PROJECT_ROOT / args.config
     
     # Run tests
     tester = MCPEnvironmentTester(config_path)
     passed, results = tester.test(server_filter=args.server, verbose=args.verbose)
     
-    # Display results
-    print("")
-    print("=" * 60)
-    print("  MCP ENVIRONMENT SELF-TEST")
-    print("=" * 60)
-    print("")
-    
+    # Display results (buffered into one write - per-line print() flushes
+    # through the slow console path on Windows)
+    lines = [""]
+    lines.append("=" * 60)
+    lines.append("  MCP ENVIRONMENT SELF-TEST")
+    lines.append("=" * 60)
+    lines.append("")
+
     for result in results:
-        print(str(result))
-    
+        lines.append(str(result))
+
     # Summary
     pass_count = sum(1 for r in results if r.status == CheckStatus.PASS)
     fail_count = sum(1 for r in results if r.status == CheckStatus.FAIL)
     warn_count = sum(1 for r in results if r.status == CheckStatus.WARN)
     skip_count = sum(1 for r in results if r.status == CheckStatus.SKIP)
-    
-    print("")
-    print("=" * 60)
-    print("  SUMMARY")
-    print("=" * 60)
-    print(f"  Passed: {pass_count}")
-    print(f"  Failed: {fail_count}")
-    print(f"  Warnings: {warn_count}")
-    print(f"  Skipped: {skip_count}")
-    print("")
-    
+
+    lines.append("")
+    lines.append("=" * 60)
+    lines.append("  SUMMARY")
+    lines.append("=" * 60)
+    lines.append(f"  Passed: {pass_count}")
+    lines.append(f"  Failed: {fail_count}")
+    lines.append(f"  Warnings: {warn_count}")
+    lines.append(f"  Skipped: {skip_count}")
+    lines.append("")
+
     if passed:
-        print("  [OK] All critical checks passed!")
+        lines.append("  [OK] All critical checks passed!")
     else:
-        print("  [FAIL] One or more checks failed")
-        print("")
-        print("  Next steps:")
-        print("  1. Review failed checks above")
-        print("  2. Ensure required services are running")
-        print("  3. Verify MCP configuration is correct")
-        print("  4. Check Cursor logs: Help > Toggle Developer Tools > Console")
-    
-    print("")
-    
+        lines.append("  [FAIL] One or more checks failed")
+        lines.append("")
+        lines.append("  Next steps:")
+        lines.append("  1. Review failed checks above")
+        lines.append("  2. Ensure required services are running")
+        lines.append("  3. Verify MCP configuration is correct")
+        lines.append("  4. Check Cursor logs: Help > Toggle Developer Tools > Console")
+
+    lines.append("")
+
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
     sys.exit(0 if passed else 1)
 
 
@@ -22,6 +22,10 @@ if sys.platform == 'win32':
     sys.stderr.reconfigure(encoding='utf-8')
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
+# Resolved once instead of per test function
+_SCRIPT_DIR = Path(__file__).resolve().parent
+_PROJECT_ROOT = _SCRIPT_DIR.parent
+
 
 def test_workspace_validation():
     """Test that workspace validation catches mismatches."""
@@ -47,7 +51,7 @@ def test_workspace_validation():
             text=True,
             encoding='utf-8',
             errors='replace',
-            cwd=Path(__file__).parent,
+            cwd=_SCRIPT_DIR,
             env={**os.environ, 'PYTHONIOENCODING': 'utf-8'}
         )
         
@@ -133,8 +137,7 @@ def test_server_startup():
     print("=" * 70)
     
     # Check if server script exists (in parent directory)
-    project_root = Path(__file__).parent.parent
-    server_path = project_root / "mcp_intelligence_server.py"
+    server_path = _PROJECT_ROOT / "mcp_intelligence_server.py"
     if not server_path.exists():
         print(f"✗ Server script not found: {server_path}")
         return False
@@ -147,9 +150,9 @@ def test_server_startup():
         [sys.executable, "-c", "import sys; sys.path.insert(0, '.'); exec(open('mcp_intelligence_server.py').read().split('if __name__')[0])"],
         capture_output=True,
         text=True,
-        cwd=project_root,
+        cwd=_PROJECT_ROOT,
         timeout=10,
-        env={**dict(__import__('os').environ), 'PYTHONPATH': str(project_root)}
+        env={**dict(__import__('os').environ), 'PYTHONPATH': str(_PROJECT_ROOT)}
     )
     
     # We expect an error about missing --workspace arg, which means the script loads
@@ -169,8 +172,7 @@ def test_existing_config():
     print("=" * 70)
     
     # Config is in parent directory (project root)
-    project_root = Path(__file__).parent.parent
-    config_path = project_root / ".cursor" / "mcp.json"
+    config_path = _PROJECT_ROOT / ".cursor" / "mcp.json"
     
     if not config_path.exists():
         print(f"⚠ Config not found: {config_path}")
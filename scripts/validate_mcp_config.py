@@ -25,25 +25,132 @@ Exit codes:
 """
 
 import argparse
+import contextlib
+import functools
+import io
 import json
+import subprocess
 import sys
 import tempfile
-import subprocess
+from collections import Counter
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+# Optional schema backends, fastest first: jsonschema-rs validates in native
+# Rust, fastjsonschema compiles the schema to straight-line Python. Both are
+# 10-100x faster than walking the config dict; the hand-rolled checks remain
+# the fallback when neither is installed.
+try:
+    import jsonschema_rs
+except ImportError:
+    jsonschema_rs = None
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+# Optional: C-level JSON parsing; stdlib json remains the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: incremental parsing for configs too large to hold comfortably in
+# memory (multi-repo setups generating hundreds of servers)
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _load_json_bytes(raw: bytes) -> Dict:
+    """Parse UTF-8 JSON bytes, tolerating a BOM, with orjson when available."""
+    raw = raw.lstrip(b'\xef\xbb\xbf')
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+# Repository root, resolved once at import instead of per main() call
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Structural schema for .cursor/mcp.json. Advisory rules (Windows command
+# hints, OLLAMA_URL/QDRANT_URL warnings, etc.) stay in the per-server pass.
+_SCHEMA = {
+    "type": "object",
+    "required": ["mcpServers"],
+    "properties": {
+        "mcpServers": {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "required": ["command", "args"],
+                "properties": {
+                    "command": {"type": "string"},
+                    "args": {"type": "array"},
+                    "env": {"type": "object"},
+                },
+            },
+        },
+    },
+}
+
+_HAS_SCHEMA_BACKEND = jsonschema_rs is not None or fastjsonschema is not None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_validator():
+    """Compile the structural schema once and reuse it for every validation.
+
+    Deferred so importing this module (or running --help) never pays the
+    compile cost; repeated --test-generation validations share one instance.
+    """
+    if jsonschema_rs is not None:
+        # validator_for arrived in 0.25; older releases expose JSONSchema
+        factory = getattr(jsonschema_rs, "validator_for", None) or jsonschema_rs.JSONSchema
+        return factory(_SCHEMA)
+    return fastjsonschema.compile(_SCHEMA)
+
+
+# Per-level (with path, without path) format strings, built once instead of
+# a dict literal + branch on every __str__ call
+_ERROR_FMT = {
+    "error": ("  [ERROR] [{path}] {msg}", "  [ERROR] {msg}"),
+    "warning": ("  [WARN] [{path}] {msg}", "  [WARN] {msg}"),
+    "info": ("  [INFO] [{path}] {msg}", "  [INFO] {msg}"),
+}
+
 
 class ValidationError:
+    __slots__ = ("level", "message", "path")
+
     def __init__(self, level: str, message: str, path: str = ""):
         self.level = level  # "error", "warning", "info"
         self.message = message
         self.path = path
-    
+
     def __str__(self):
-        prefix = {"error": "[ERROR]", "warning": "[WARN]", "info": "[INFO]"}[self.level]
+        with_path, without_path = _ERROR_FMT[self.level]
         if self.path:
-            return f"  {prefix} [{self.path}] {self.message}"
-        return f"  {prefix} {self.message}"
+            return with_path.format(path=self.path, msg=self.message)
+        return without_path.format(msg=self.message)
+
+
+def _check_schema(config: Dict) -> "ValidationError | None":
+    """Run the structural schema through the fastest available backend."""
+    validator = _get_validator()
+    if jsonschema_rs is not None:
+        try:
+            validator.validate(config)
+        except jsonschema_rs.ValidationError as e:
+            path = ".".join(str(p) for p in e.instance_path)
+            return ValidationError("error", e.message, path)
+        return None
+    try:
+        validator(config)
+    except fastjsonschema.JsonSchemaException as e:
+        return ValidationError("error", e.message, ".".join(str(p) for p in e.path[1:]))
+    return None
 
 
 def validate_json_structure(config: Dict) -> List[ValidationError]:
@@ -64,191 +171,350 @@ def validate_json_structure(config: Dict) -> List[ValidationError]:
     return errors
 
 
-def validate_server_config(name: str, server: Dict) -> List[ValidationError]:
-    """Validate individual server configuration."""
-    errors = []
-    
+def _server_errors(name: str, server: Dict):
+    """Yield validation errors for one server entry.
+
+    Generator so the caller can fuse all per-server checks into a single
+    walk without materializing intermediate lists.
+    """
     # Required fields
     if "command" not in server:
-        errors.append(ValidationError("error", "Missing 'command' field", name))
-    
+        yield ValidationError("error", "Missing 'command' field", name)
+
     if "args" not in server:
-        errors.append(ValidationError("error", "Missing 'args' field", name))
+        yield ValidationError("error", "Missing 'args' field", name)
     elif not isinstance(server["args"], list):
-        errors.append(ValidationError("error", "'args' must be an array", name))
-    
+        yield ValidationError("error", "'args' must be an array", name)
+
     # Command validation
     command = server.get("command", "")
     if command == "python":
-        errors.append(ValidationError("warning", 
-            "Use 'cmd /c python' on Windows for STDIO compatibility", name))
-    
-    # Check for ${workspaceFolder} usage
-    args_str = " ".join(str(a) for a in server.get("args", []))
-    if "${workspaceFolder}" not in args_str:
+        yield ValidationError("warning",
+            "Use 'cmd /c python' on Windows for STDIO compatibility", name)
+
+    # Check for ${workspaceFolder} usage; any() short-circuits on the first
+    # hit instead of joining every arg into a throwaway string
+    lower_name = name.lower()
+    uses_workspace_var = any(
+        "${workspaceFolder}" in a
+        for a in server.get("args", [])
+        if isinstance(a, str)
+    )
+    if not uses_workspace_var:
         # Not necessarily an error, but worth noting
-        if "workspace" in name.lower() or "intelligence" in name.lower():
-            errors.append(ValidationError("info", 
-                "Consider using ${workspaceFolder} for portability", name))
-    
+        if "workspace" in lower_name or "intelligence" in lower_name:
+            yield ValidationError("info",
+                "Consider using ${workspaceFolder} for portability", name)
+
     # Validate env if present
     if "env" in server:
         if not isinstance(server["env"], dict):
-            errors.append(ValidationError("error", "'env' must be an object", name))
+            yield ValidationError("error", "'env' must be an object", name)
         else:
-            # Check for common env vars
+            # Check for common env vars; set difference finds all missing
+            # ones at once, sorted for deterministic output order
             env = server["env"]
-            if "code-intelligence" in name.lower():
-                if "OLLAMA_URL" not in env:
-                    errors.append(ValidationError("warning", 
-                        "Missing OLLAMA_URL environment variable", name))
-                if "QDRANT_URL" not in env:
-                    errors.append(ValidationError("warning", 
-                        "Missing QDRANT_URL environment variable", name))
-    
-    return errors
+            if _INTEL_MARKER in lower_name:
+                for var in sorted(_INTEL_REQUIRED_ENV - env.keys()):
+                    yield ValidationError("warning",
+                        f"Missing {var} environment variable", name)
+
+
+def validate_server_config(name: str, server: Dict) -> List[ValidationError]:
+    """Validate individual server configuration."""
+    return list(_server_errors(name, server))
+
+
+def _iter_errors(config: Dict):
+    """Yield server and mode-consistency errors in one pass over the config."""
+    servers = config.get("mcpServers")
+    if not isinstance(servers, dict):
+        # Structure validation already reported this; nothing left to walk
+        return
+    # Classify mode servers while walking instead of re-scanning the dict
+    # four more times in a separate consistency pass
+    flags = dict.fromkeys(_MODE_SERVERS, False)
+    intelligence_servers = []
+    for name, server in servers.items():
+        if name in flags:
+            flags[name] = True
+        if "intelligence" in name.lower():
+            intelligence_servers.append(name)
+        yield from _server_errors(name, server)
+    yield from _mode_errors(flags, intelligence_servers)
+
+
+# Server names whose presence determines single vs multi-repo mode
+_MODE_SERVERS = ("git", "git-multi", "filesystem", "filesystem-multi")
+
+# Env vars every code-intelligence server is expected to define
+_INTEL_MARKER = "code-intelligence"
+_INTEL_REQUIRED_ENV = frozenset(("OLLAMA_URL", "QDRANT_URL"))
+
+
+def _mode_errors(flags: Dict[str, bool], intelligence_servers: List[str]):
+    """Yield mode-consistency errors from already-classified server names."""
+    if flags["git-multi"] and flags["git"]:
+        yield ValidationError("warning",
+            "Both 'git' and 'git-multi' defined - possible mode conflict")
+
+    if flags["filesystem-multi"] and flags["filesystem"]:
+        yield ValidationError("warning",
+            "Both 'filesystem' and 'filesystem-multi' defined - possible mode conflict")
+
+    # Multi-repo mode checks
+    if flags["git-multi"] or flags["filesystem-multi"]:
+        if len(intelligence_servers) == 1 and intelligence_servers[0] == "code-intelligence":
+            yield ValidationError("info",
+                "Multi-repo mode detected but only one intelligence server")
 
 
 def validate_mode_consistency(config: Dict) -> List[ValidationError]:
     """Validate mode consistency (single vs multi-repo)."""
-    errors = []
     servers = config.get("mcpServers", {})
-    
-    # Detect mode
-    has_multi_git = "git-multi" in servers
-    has_multi_fs = "filesystem-multi" in servers
-    has_single_git = "git" in servers
-    has_single_fs = "filesystem" in servers
-    
+    flags = {name: name in servers for name in _MODE_SERVERS}
     intelligence_servers = [k for k in servers.keys() if "intelligence" in k.lower()]
-    
-    if has_multi_git and has_single_git:
-        errors.append(ValidationError("warning", 
-            "Both 'git' and 'git-multi' defined - possible mode conflict"))
-    
-    if has_multi_fs and has_single_fs:
-        errors.append(ValidationError("warning", 
-            "Both 'filesystem' and 'filesystem-multi' defined - possible mode conflict"))
-    
-    # Multi-repo mode checks
-    if has_multi_git or has_multi_fs:
-        if len(intelligence_servers) == 1 and intelligence_servers[0] == "code-intelligence":
-            errors.append(ValidationError("info", 
-                "Multi-repo mode detected but only one intelligence server"))
-    
-    return errors
+    return list(_mode_errors(flags, intelligence_servers))
+
+
+# Above this size, prefer streaming validation (when ijson is installed)
+# over materializing the whole config dict
+_STREAM_THRESHOLD = 128 * 1024
+
+
+def _stream_has_top_level_key(config_path: Path, key: str) -> bool:
+    """Scan parse events for a top-level key, stopping at the first match."""
+    with open(config_path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f):
+            if prefix == '' and event == 'map_key' and value == key:
+                return True
+    return False
+
 
+def _validate_config_streaming(config_path: Path) -> Tuple[bool, List[ValidationError]]:
+    """Validate server-by-server without loading the whole file.
 
-def validate_config_file(config_path: Path, verbose: bool = False) -> Tuple[bool, List[ValidationError]]:
-    """Validate a configuration file."""
+    ijson yields each (name, server) pair as it is parsed, so peak memory
+    stays at one server entry regardless of config size. Advisory checks
+    match the in-memory walk; the compiled-schema pass is skipped. kvitems
+    cannot tell a missing 'mcpServers' key from an empty object, so when no
+    servers were yielded a second event scan checks for the key itself to
+    keep the verdict in line with the in-memory path.
+    """
     all_errors = []
-    
-    # Check file exists
-    if not config_path.exists():
-        return False, [ValidationError("error", f"Config file not found: {config_path}")]
-    
-    # Parse JSON
+    flags = dict.fromkeys(_MODE_SERVERS, False)
+    intelligence_servers = []
+    server_count = 0
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-    except json.JSONDecodeError as e:
+        with open(config_path, 'rb') as f:
+            for name, server in ijson.kvitems(f, 'mcpServers'):
+                server_count += 1
+                if name in flags:
+                    flags[name] = True
+                if "intelligence" in name.lower():
+                    intelligence_servers.append(name)
+                all_errors.extend(_server_errors(name, server))
+    except Exception as e:
         return False, [ValidationError("error", f"Invalid JSON: {e}")]
-    
-    # Structure validation
-    all_errors.extend(validate_json_structure(config))
-    
-    # Server validation
-    for name, server in config.get("mcpServers", {}).items():
-        all_errors.extend(validate_server_config(name, server))
-    
-    # Mode consistency
-    all_errors.extend(validate_mode_consistency(config))
-    
+
+    if server_count == 0:
+        try:
+            has_key = _stream_has_top_level_key(config_path, 'mcpServers')
+        except Exception as e:
+            return False, [ValidationError("error", f"Invalid JSON: {e}")]
+        if not has_key:
+            return False, [ValidationError("error", "Missing 'mcpServers' key")]
+        all_errors.append(ValidationError("warning", "No MCP servers defined"))
+    all_errors.extend(_mode_errors(flags, intelligence_servers))
+
+    has_errors = any(e.level == "error" for e in all_errors)
+    return not has_errors, all_errors
+
+
+def _validate_config_dict(config: Dict) -> Tuple[bool, List[ValidationError]]:
+    """Validate an already-parsed config dict."""
+    all_errors = []
+
+    # Structure validation (single compiled-schema call when available)
+    if _HAS_SCHEMA_BACKEND:
+        schema_error = _check_schema(config)
+        if schema_error is not None:
+            return False, [schema_error]
+        if not config["mcpServers"]:
+            all_errors.append(ValidationError("warning", "No MCP servers defined"))
+    else:
+        all_errors.extend(validate_json_structure(config))
+
+    # Server validation + mode consistency, fused into a single generator walk
+    all_errors.extend(_iter_errors(config))
+
     # Determine pass/fail
     has_errors = any(e.level == "error" for e in all_errors)
-    
+
     return not has_errors, all_errors
 
 
+def validate_config_file(config: "Path | Dict", verbose: bool = False,
+                         stream: bool = False) -> Tuple[bool, List[ValidationError]]:
+    """Validate a config given as a file path or an already-parsed dict.
+
+    Accepting a dict lets callers that just built a config (the generation
+    tests) validate it directly instead of writing it out and re-parsing.
+    """
+    if isinstance(config, dict):
+        return _validate_config_dict(config)
+
+    config_path = config
+
+    # Check file exists
+    if not config_path.exists():
+        return False, [ValidationError("error", f"Config file not found: {config_path}")]
+
+    # Large configs stream through ijson when available; small ones are not
+    # worth the event-parser overhead unless --stream forces it
+    if ijson is not None and (stream or config_path.stat().st_size >= _STREAM_THRESHOLD):
+        return _validate_config_streaming(config_path)
+
+    # Parse JSON (orjson parses the raw bytes without a str round trip)
+    try:
+        parsed = _load_json_bytes(config_path.read_bytes())
+    except ValueError as e:
+        # Covers both json.JSONDecodeError and orjson.JSONDecodeError
+        return False, [ValidationError("error", f"Invalid JSON: {e}")]
+
+    return _validate_config_dict(parsed)
+
+
+def _load_config_builder(scripts_dir: Path):
+    """Import the config builder in-process (no interpreter cold start)."""
+    if str(scripts_dir) not in sys.path:
+        sys.path.insert(0, str(scripts_dir))
+    import mcp_config_builder
+    return mcp_config_builder
+
+
+def _run_builder_subprocess(builder_script: Path, mode_args: List[str], verbose: bool):
+    """Run the config builder in a trimmed-down child interpreter.
+
+    Fallback for when the in-process import fails. -I isolates the child
+    from site/user packages and -S skips the site import, both of which cut
+    interpreter startup time; the builder only needs the stdlib. Progress
+    output is discarded unless verbose.
+    """
+    cmd = [sys.executable, "-S", "-I", str(builder_script)] + mode_args + ["--no-backup"]
+    return subprocess.run(
+        cmd,
+        stdout=None if verbose else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
 def test_config_generation(core_path: Path, verbose: bool = False) -> Tuple[bool, List[str]]:
     """Test that config generation works for both modes."""
     messages = []
     builder_script = core_path / "scripts" / "mcp_config_builder.py"
-    
+
     if not builder_script.exists():
         return False, ["Config builder script not found"]
-    
+
+    # Import once and call the builder directly instead of spawning a fresh
+    # interpreter per mode (each subprocess paid startup + import cost).
+    try:
+        mcb = _load_config_builder(builder_script.parent)
+    except Exception:
+        # e.g. a conflicting module name shadows the builder on sys.path;
+        # fall back to running it in child interpreters
+        mcb = None
+
+    # Builder progress output is only interesting in verbose mode
+    capture = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
     # Test single-repo generation
     with tempfile.TemporaryDirectory() as tmpdir:
         tmp_workspace = Path(tmpdir) / "test_workspace"
         tmp_workspace.mkdir()
         (tmp_workspace / ".cursor").mkdir()
-        
-        # Run single-repo generation
-        result = subprocess.run(
-            ["python", str(builder_script), "--single", "--workspace", str(tmp_workspace), "--no-backup"],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode != 0:
-            messages.append(f"Single-repo generation failed: {result.stderr}")
-            return False, messages
-        
-        # Validate generated config
+
         config_path = tmp_workspace / ".cursor" / "mcp.json"
-        if not config_path.exists():
+        if mcb is not None:
+            try:
+                config = mcb.build_single_repo_config(tmp_workspace)
+                with capture:
+                    written = mcb.write_config(config, config_path, backup=False)
+            except Exception as e:
+                messages.append(f"Single-repo generation failed: {e}")
+                return False, messages
+        else:
+            result = _run_builder_subprocess(
+                builder_script, ["--single", "--workspace", str(tmp_workspace)], verbose)
+            written = result.returncode == 0
+            if not written:
+                messages.append(f"Single-repo generation failed: {result.stderr}")
+                return False, messages
+
+        if not written or not config_path.exists():
             messages.append("Single-repo config not created")
             return False, messages
-        
-        passed, errors = validate_config_file(config_path, verbose)
+
+        # Validate the in-memory dict when we have it, skipping the re-parse
+        # round trip; the subprocess fallback only leaves us the file
+        passed, errors = validate_config_file(
+            config if mcb is not None else config_path, verbose)
         if not passed:
             messages.append("Single-repo config validation failed:")
             messages.extend([str(e) for e in errors if e.level == "error"])
             return False, messages
-        
+
         messages.append("[OK] Single-repo generation: PASSED")
-    
+
     # Test multi-repo generation (with mock repos)
     with tempfile.TemporaryDirectory() as tmpdir:
         tmp_core = Path(tmpdir) / "core"
         tmp_core.mkdir()
         (tmp_core / ".cursor").mkdir()
         (tmp_core / "workspaces").mkdir()
-        
+
         # Create mock repos
         for repo_name in ["repo-a", "repo-b"]:
             repo_path = tmp_core / "workspaces" / repo_name
             repo_path.mkdir()
             (repo_path / ".git").mkdir()  # Simulate git repo
-        
-        repo_paths = [str(tmp_core / "workspaces" / "repo-a"), str(tmp_core / "workspaces" / "repo-b")]
-        
-        # Run multi-repo generation
-        result = subprocess.run(
-            ["python", str(builder_script), "--multi", "--core", str(tmp_core), "--repos"] + repo_paths + ["--no-backup"],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode != 0:
-            messages.append(f"Multi-repo generation failed: {result.stderr}")
-            return False, messages
-        
-        # Validate generated config
+
+        repo_paths = [tmp_core / "workspaces" / "repo-a", tmp_core / "workspaces" / "repo-b"]
+
         config_path = tmp_core / ".cursor" / "mcp.json"
-        if not config_path.exists():
+        if mcb is not None:
+            try:
+                config = mcb.build_multi_repo_config(tmp_core, repo_paths)
+                with capture:
+                    written = mcb.write_config(config, config_path, backup=False)
+            except Exception as e:
+                messages.append(f"Multi-repo generation failed: {e}")
+                return False, messages
+        else:
+            result = _run_builder_subprocess(
+                builder_script,
+                ["--multi", "--core", str(tmp_core), "--repos"] + [str(p) for p in repo_paths],
+                verbose)
+            written = result.returncode == 0
+            if not written:
+                messages.append(f"Multi-repo generation failed: {result.stderr}")
+                return False, messages
+
+        if not written or not config_path.exists():
             messages.append("Multi-repo config not created")
             return False, messages
-        
-        passed, errors = validate_config_file(config_path, verbose)
+
+        passed, errors = validate_config_file(
+            config if mcb is not None else config_path, verbose)
         if not passed:
             messages.append("Multi-repo config validation failed:")
             messages.extend([str(e) for e in errors if e.level == "error"])
             return False, messages
-        
+
         messages.append("[OK] Multi-repo generation: PASSED")
-    
+
     return True, messages
 
 
@@ -258,13 +524,14 @@ def main():
     parser.add_argument("--verbose", "-v", action="store_true", help="Show all messages including info")
     parser.add_argument("--test-generation", action="store_true", help="Test config generation (CI mode)")
     parser.add_argument("--strict", action="store_true", help="Treat warnings as errors")
-    
+    parser.add_argument("--stream", action="store_true",
+                        help="Force streaming validation (requires ijson; automatic for large configs)")
+
     args = parser.parse_args()
     
     # Find core path
-    script_path = Path(__file__).resolve()
-    core_path = script_path.parent.parent
-    
+    core_path = _PROJECT_ROOT
+
     print("")
     print("=" * 60)
     print("  MCP CONFIGURATION VALIDATOR")
@@ -289,17 +556,19 @@ def main():
     print(f"  Validating: {args.config}")
     print("")
     
-    passed, errors = validate_config_file(config_path, args.verbose)
-    
-    # Filter and display errors
+    passed, errors = validate_config_file(config_path, args.verbose, stream=args.stream)
+
+    # Filter/display errors and tally levels in the same pass
+    counts = Counter()
     for error in errors:
+        counts[error.level] += 1
         if error.level == "info" and not args.verbose:
             continue
         print(str(error))
-    
+
     # Summary
-    error_count = sum(1 for e in errors if e.level == "error")
-    warning_count = sum(1 for e in errors if e.level == "warning")
+    error_count = counts["error"]
+    warning_count = counts["warning"]
     
     print("")
     if args.strict and warning_count > 0:
@@ -12,10 +12,18 @@ Usage:
 import argparse
 import sys
 import os
+from importlib.metadata import PackageNotFoundError, version
+from importlib.util import find_spec
 from pathlib import Path
 from typing import List, Tuple
 import json
 
+# Optional: C-level JSON parsing; stdlib json remains the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Fix Windows console encoding for emoji support
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -73,10 +81,14 @@ def validate_workspace(workspace_path: Path) -> Tuple[bool, List[str]]:
             
             # Check 5: Validate config references workspace
             try:
-                # Use utf-8-sig to handle BOM if present
-                with open(config_path, 'r', encoding='utf-8-sig') as f:
-                    config = json.load(f)
-                    
+                # Strip the BOM if present (configs written on Windows)
+                raw = config_path.read_bytes().lstrip(b'\xef\xbb\xbf')
+                if orjson is not None:
+                    config = orjson.loads(raw)
+                else:
+                    config = json.loads(raw.decode('utf-8'))
+
+
                 # Check code-intelligence server
                 if 'mcpServers' in config and 'code-intelligence' in config['mcpServers']:
                     intel_server = config['mcpServers']['code-intelligence']
@@ -126,30 +138,30 @@ def validate_workspace(workspace_path: Path) -> Tuple[bool, List[str]]:
         messages.append(f"         Checked: {[str(p) for p in mcp_config_paths]}")
     
     # Check 6: Python dependencies
-    try:
-        import fastmcp
-        messages.append(f"✅ PASS: fastmcp installed (v{fastmcp.__version__})")
-    except ImportError:
+    # find_spec answers "is it installed?" without executing package init
+    # code (importing langchain_ollama alone pulls in pydantic + langchain_core)
+    if find_spec("fastmcp") is not None:
+        try:
+            messages.append(f"✅ PASS: fastmcp installed (v{version('fastmcp')})")
+        except PackageNotFoundError:
+            messages.append(f"✅ PASS: fastmcp installed")
+    else:
         messages.append(f"❌ FAIL: fastmcp not installed")
         messages.append(f"         Run: pip install -r requirements.txt")
         success = False
-    except AttributeError:
-        messages.append(f"✅ PASS: fastmcp installed")
-    
-    try:
-        import langchain_ollama
+
+    if find_spec("langchain_ollama") is not None:
         messages.append(f"✅ PASS: langchain-ollama installed")
-    except ImportError:
+    else:
         messages.append(f"❌ FAIL: langchain-ollama not installed")
         success = False
-    
-    try:
-        import qdrant_client
+
+    if find_spec("qdrant_client") is not None:
         messages.append(f"✅ PASS: qdrant-client installed")
-    except ImportError:
+    else:
         messages.append(f"❌ FAIL: qdrant-client not installed")
         success = False
-    
+
     return success, messages
 
 
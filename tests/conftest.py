@@ -8,47 +8,32 @@ Provides:
 - Sample code files
 """
 
+import numpy as np
 import pytest
+import responses
+import os
 import tempfile
 import shutil
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Generator, Dict, Any
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
 import json
 
+try:
+    from qdrant_client import QdrantClient
+except ImportError:
+    QdrantClient = None
+
 
 # ============================================================================
 # Workspace Fixtures
 # ============================================================================
 
-@pytest.fixture
-def temp_workspace(tmp_path: Path) -> Generator[Path, None, None]:
-    """
-    Create a temporary workspace with sample code files.
-    
-    Structure:
-        temp_workspace/
-        ├── src/
-        │   ├── main.py
-        │   ├── utils.py
-        │   └── api/
-        │       └── routes.py
-        ├── tests/
-        │   └── test_main.py
-        └── README.md
-    
-    Yields:
-        Path: Temporary workspace directory
-    """
-    workspace = tmp_path / "test_workspace"
-    workspace.mkdir()
-    
-    # Create src directory
-    src_dir = workspace / "src"
-    src_dir.mkdir()
-    
-    # Create sample Python files
-    (src_dir / "main.py").write_text('''
+# Sample workspace contents, pre-encoded once at module load so fixture
+# setup is a single linear pass of mkdir + write_bytes per file
+_WORKSPACE_FILES: Dict[str, bytes] = {
+    "src/main.py": b'''
 def main():
     """Entry point for the application."""
     print("Hello, World!")
@@ -64,9 +49,8 @@ def run_application():
 def handle_error(error):
     """Handle application errors."""
     print(f"Error: {error}")
-''')
-    
-    (src_dir / "utils.py").write_text('''
+''',
+    "src/utils.py": b'''
 import asyncio
 from typing import Optional, List
 
@@ -89,13 +73,8 @@ def retry_operation(func, max_attempts: int = 3):
             if attempt == max_attempts - 1:
                 raise
             time.sleep(2 ** attempt)
-''')
-    
-    # Create API subdirectory
-    api_dir = src_dir / "api"
-    api_dir.mkdir()
-    
-    (api_dir / "routes.py").write_text('''
+''',
+    "src/api/routes.py": b'''
 from fastapi import APIRouter, HTTPException
 
 router = APIRouter()
@@ -111,13 +90,8 @@ async def create_data(data: dict):
     if not data:
         raise HTTPException(status_code=400, detail="Data required")
     return {"id": 1, "data": data}
-''')
-    
-    # Create tests directory
-    tests_dir = workspace / "tests"
-    tests_dir.mkdir()
-    
-    (tests_dir / "test_main.py").write_text('''
+''',
+    "tests/test_main.py": b'''
 import pytest
 from src.main import main, handle_error
 
@@ -128,10 +102,8 @@ def test_main():
 def test_error_handling():
     """Test error handling logic."""
     handle_error(Exception("test error"))
-''')
-    
-    # Create README
-    (workspace / "README.md").write_text('''
+''',
+    "README.md": b'''
 # Test Project
 
 Sample project for testing AIStack-MCP.
@@ -140,13 +112,61 @@ Sample project for testing AIStack-MCP.
 - Error handling patterns
 - Async operations
 - API endpoints
-''')
-    
+''',
+}
+
+
+def _populate_workspace(workspace: Path) -> None:
+    """Write the sample workspace file tree under an existing directory."""
+    for rel, data in _WORKSPACE_FILES.items():
+        path = workspace / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+@pytest.fixture(scope="session")
+def _workspace_template(tmp_path_factory) -> Path:
+    """
+    Session-scoped sample workspace template.
+
+    Built once per session; per-test workspaces are cheap copies of it.
+    """
+    template = tmp_path_factory.mktemp("workspace_template") / "test_workspace"
+    template.mkdir()
+    _populate_workspace(template)
+    return template
+
+
+@pytest.fixture
+def temp_workspace(_workspace_template: Path, tmp_path: Path) -> Generator[Path, None, None]:
+    """
+    Create a temporary workspace with sample code files.
+
+    Structure:
+        temp_workspace/
+        ├── src/
+        │   ├── main.py
+        │   ├── utils.py
+        │   └── api/
+        │       └── routes.py
+        ├── tests/
+        │   └── test_main.py
+        └── README.md
+
+    Yields:
+        Path: Temporary workspace directory
+    """
+    workspace = tmp_path / "test_workspace"
+    try:
+        # Hardlink the template files where the filesystem allows it
+        shutil.copytree(_workspace_template, workspace, copy_function=os.link)
+    except OSError:
+        # e.g. hardlinks across volumes on Windows
+        shutil.copytree(_workspace_template, workspace)
+
+    # No explicit cleanup: pytest rotates tmp_path base dirs itself, and the
+    # extra rmtree walked the same inodes a second time for nothing
     yield workspace
-    
-    # Cleanup
-    if workspace.exists():
-        shutil.rmtree(workspace)
 
 
 @pytest.fixture
@@ -163,33 +183,47 @@ def minimal_workspace(tmp_path: Path) -> Generator[Path, None, None]:
 def hello():
     return "Hello, World!"
 ''')
-    
+
     yield workspace
-    
-    if workspace.exists():
-        shutil.rmtree(workspace)
 
 
 # ============================================================================
 # Mock Service Fixtures
 # ============================================================================
 
+# Shared fake embedding vector, built once at module load. Response bodies
+# are serialized once per batch size and reused, so repeated tests never
+# re-serialize the same 1024-float payload.
+_EMBED_VEC = [0.1] * 1024  # Fake 1024-dim embedding
+_EMBED_BODY_CACHE: Dict[int, bytes] = {}
+
+
+def _embed_request_callback(request):
+    """Answer a batched /api/embed POST with one fake vector per input."""
+    payload = json.loads(request.body or "{}")
+    n = len(payload.get("input", []))
+    body = _EMBED_BODY_CACHE.get(n)
+    if body is None:
+        body = json.dumps({"embeddings": [_EMBED_VEC] * n}).encode()
+        _EMBED_BODY_CACHE[n] = body
+    return 200, {"Content-Type": "application/json"}, body
+
+
 @pytest.fixture
 def mock_ollama_embeddings():
     """
     Mock Ollama embeddings API.
-    
-    Returns consistent fake embeddings for testing.
+
+    Intercepts at the transport layer via `responses`, so plain
+    requests.post and pooled Session instances are both covered.
     """
-    with patch('requests.post') as mock_post:
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "embedding": [0.1] * 1024  # Fake 1024-dim embedding
-        }
-        mock_response.raise_for_status = Mock()
-        mock_post.return_value = mock_response
-        yield mock_post
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(
+            responses.POST,
+            "http://localhost:11434/api/embed",
+            callback=_embed_request_callback,
+        )
+        yield rsps
 
 
 @pytest.fixture
@@ -214,77 +248,79 @@ def mock_ollama_llm():
         yield mock_instance
 
 
+# Default Qdrant response data, built once at module load; fixtures only wire
+# fresh MagicMock plumbing around these shared read-only defaults instead of
+# rebuilding a Mock tree per test
+_QDRANT_COLLECTIONS_RESPONSE = SimpleNamespace(
+    collections=[SimpleNamespace(name="test_collection")]
+)
+_QDRANT_EMPTY_INFO = SimpleNamespace(points_count=0)
+_QDRANT_DEFAULT_SEARCH = SimpleNamespace(
+    points=[
+        SimpleNamespace(
+            score=0.85,
+            payload={
+                "path": "src/main.py",
+                "text": "def main(): pass",
+                "chunk_index": 0,
+            },
+        )
+    ]
+)
+
+
 @pytest.fixture
 def mock_qdrant_client():
     """
     Mock Qdrant client for vector operations.
-    
+
     Simulates collection creation, upsertion, and search.
     """
-    mock_client = MagicMock()
-    
-    # Mock get_collections
-    mock_collection = Mock()
-    mock_collection.name = "test_collection"
-    mock_collections_response = Mock()
-    mock_collections_response.collections = [mock_collection]
-    mock_client.get_collections.return_value = mock_collections_response
-    
-    # Mock get_collection (for stats)
-    mock_collection_info = Mock()
-    mock_collection_info.points_count = 0
-    mock_client.get_collection.return_value = mock_collection_info
-    
-    # Mock create_collection
+    # The client itself stays a MagicMock so tests can rewire return values
+    # and inspect call args; only the static response payloads are shared.
+    # spec'ing against the real client (when installed) makes typos on the
+    # mock fail fast instead of silently returning child mocks.
+    if QdrantClient is not None:
+        mock_client = MagicMock(spec=QdrantClient)
+    else:
+        mock_client = MagicMock()
+    mock_client.get_collections.return_value = _QDRANT_COLLECTIONS_RESPONSE
+    mock_client.get_collection.return_value = _QDRANT_EMPTY_INFO
     mock_client.create_collection.return_value = True
-    
-    # Mock upsert
     mock_client.upsert.return_value = True
-    
-    # Mock query_points (search)
-    mock_point = Mock()
-    mock_point.score = 0.85
-    mock_point.payload = {
-        "path": "src/main.py",
-        "text": "def main(): pass",
-        "chunk_index": 0
-    }
-    
-    mock_search_result = Mock()
-    mock_search_result.points = [mock_point]
-    mock_client.query_points.return_value = mock_search_result
-    
+    mock_client.query_points.return_value = _QDRANT_DEFAULT_SEARCH
+
     yield mock_client
 
 
+# Canned "already indexed" responses: 50 points and three descending-score
+# search hits, built once instead of a Mock-building loop per test
+_QDRANT_INDEXED_INFO = SimpleNamespace(points_count=50)
+_QDRANT_INDEXED_SEARCH = SimpleNamespace(
+    points=[
+        SimpleNamespace(
+            score=0.95 - (i * 0.05),
+            payload={
+                "path": f"src/file{i}.py",
+                "text": f"def function_{i}(): pass",
+                "chunk_index": i,
+            },
+        )
+        for i in range(3)
+    ]
+)
+
+
 @pytest.fixture
 def mock_qdrant_with_data(mock_qdrant_client):
     """
     Mock Qdrant client with indexed data.
-    
+
     Simulates a workspace that has already been indexed.
     """
-    # Override points_count to indicate indexed data
-    mock_collection_info = Mock()
-    mock_collection_info.points_count = 50
-    mock_qdrant_client.get_collection.return_value = mock_collection_info
-    
-    # Add multiple search results
-    mock_points = []
-    for i in range(3):
-        mock_point = Mock()
-        mock_point.score = 0.95 - (i * 0.05)
-        mock_point.payload = {
-            "path": f"src/file{i}.py",
-            "text": f"def function_{i}(): pass",
-            "chunk_index": i
-        }
-        mock_points.append(mock_point)
-    
-    mock_search_result = Mock()
-    mock_search_result.points = mock_points
-    mock_qdrant_client.query_points.return_value = mock_search_result
-    
+    mock_qdrant_client.get_collection.return_value = _QDRANT_INDEXED_INFO
+    mock_qdrant_client.query_points.return_value = _QDRANT_INDEXED_SEARCH
+
     yield mock_qdrant_client
 
 
@@ -329,9 +365,16 @@ def mock_env_vars(test_config: Dict[str, Any], monkeypatch):
 # ============================================================================
 
 @pytest.fixture
-def sample_embeddings() -> list:
-    """Sample embeddings for testing."""
-    return [[0.1 + i * 0.01] * 1024 for i in range(5)]
+def sample_embeddings() -> np.ndarray:
+    """Sample embeddings for testing (contiguous (5, 1024) float32 matrix)."""
+    base = np.arange(5, dtype=np.float32)[:, None] * 0.01 + 0.1
+    return np.broadcast_to(base, (5, 1024)).copy()
+
+
+@pytest.fixture
+def sample_embeddings_list(sample_embeddings) -> list:
+    """List-of-lists view of sample_embeddings, for API-parity tests."""
+    return sample_embeddings.tolist()
 
 
 @pytest.fixture
@@ -375,23 +418,6 @@ def sample_code_chunks():
     ]
 
 
-# ============================================================================
-# Async Test Support
-# ============================================================================
-
-@pytest.fixture
-def event_loop():
-    """
-    Create an event loop for async tests.
-    
-    Required for pytest-asyncio.
-    """
-    import asyncio
-    loop = asyncio.new_event_loop()
-    yield loop
-    loop.close()
-
-
 # ============================================================================
 # Integration Test Fixtures
 # ============================================================================
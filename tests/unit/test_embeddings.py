@@ -4,33 +4,195 @@ Unit tests for embedding generation.
 Tests the embed_texts function with various inputs and edge cases.
 """
 
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
 import pytest
 from unittest.mock import patch, Mock
 import requests
+from requests.adapters import HTTPAdapter, Retry
+
+# Optional: C-level JSON parsing; response.json() remains the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 # Import the function to test (adjust import path as needed)
 # from mcp_intelligence_server import embed_texts
 
 
-def embed_texts_mock(texts: list, model: str = "mxbai-embed-large") -> list:
+# Cap on texts per /api/embed call, in case the server limits input size
+_MAX_BATCH = 64
+
+# Embedding dimension of mxbai-embed-large
+_DIM = 1024
+
+# Canned mock vectors, built once per module instead of once per test
+_VEC_01 = [0.1] * _DIM
+_VEC_02 = [0.2] * _DIM
+_VEC_03 = [0.3] * _DIM
+_VEC_04 = [0.4] * _DIM
+_VEC_05 = [0.5] * _DIM
+_VEC_06 = [0.6] * _DIM
+
+# Pooled session shared by every call: keeps TCP connections alive between
+# batches instead of reconnecting per POST. Transient failures (connection
+# resets, 429/5xx) retry with exponential backoff + jitter before the caller
+# ever sees the zero fallback; Retry-After headers are honored. POST must be
+# allowed explicitly — it is not in urllib3's default retryable methods.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.2,
+    backoff_jitter=0.2,
+    backoff_max=5.0,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"POST"}),
+    respect_retry_after_header=True,
+)
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=_RETRY,
+))
+
+# Embedding cache keyed by (model, text). A hand-rolled OrderedDict LRU
+# instead of functools.lru_cache so cache misses can still be batched into
+# shared POSTs; only successful responses are cached, fallbacks are not.
+# Entries are stored FP16-packed: 2 KB instead of 4 KB per vector, at a
+# precision loss far below what cosine-similarity consumers notice.
+_EMBED_CACHE: "OrderedDict[tuple, bytes]" = OrderedDict()
+_EMBED_CACHE_MAX = 4096
+
+
+def _cache_pack(row: "np.ndarray") -> bytes:
+    """Compress a float32 vector to FP16 bytes for cache storage."""
+    return row.astype(np.float16).tobytes()
+
+
+def _cache_unpack(buf: bytes) -> "np.ndarray":
+    """Expand an FP16-packed cache entry back to float32."""
+    return np.frombuffer(buf, dtype=np.float16).astype(np.float32)
+
+
+# Worker pool for fanning multi-batch calls out over the shared session;
+# the GIL is released inside the socket syscalls so the I/O overlaps
+_POOL = ThreadPoolExecutor(max_workers=8)
+
+
+def _embed_cache_clear():
+    """Reset the embedding cache (test isolation)."""
+    _EMBED_CACHE.clear()
+
+
+def _parse_response(response) -> dict:
+    """Decode an embed response body.
+
+    orjson parses the raw bytes directly, skipping requests' str round
+    trip; fakes without a bytes body fall back to response.json().
+    """
+    if orjson is not None:
+        content = getattr(response, "content", None)
+        if isinstance(content, (bytes, str)):
+            return orjson.loads(content)
+    return response.json()
+
+
+def _embed_batch(model: str, batch: list):
+    """POST one batch; None signals failure (rows keep the zero fallback)."""
+    try:
+        response = _SESSION.post(
+            "http://localhost:11434/api/embed",
+            json={"model": model, "input": batch},
+            timeout=30
+        )
+        response.raise_for_status()
+        return _parse_response(response)["embeddings"]
+    except Exception:
+        return None
+
+
+def embed_texts_mock(texts: list, model: str = "mxbai-embed-large") -> "np.ndarray":
     """
     Mock implementation for testing.
     Replace with actual import once extracted to separate module.
+
+    Embeds through Ollama's batched /api/embed endpoint: one POST per
+    _MAX_BATCH slice instead of one per text, so N texts cost
+    ceil(N / _MAX_BATCH) round-trips. Texts embedded before are answered
+    from the LRU cache without touching the API.
+
+    Returns a contiguous (len(texts), 1024) float32 matrix, ready for the
+    similarity/matmul consumers downstream without a per-row conversion.
+    Rows of a failed batch are left at the zero fallback.
+    """
+    # Fast path: callers pre-filtering chunks hit this constantly
+    if not texts:
+        return np.zeros((0, _DIM), dtype=np.float32)
+
+    out = np.zeros((len(texts), _DIM), dtype=np.float32)
+
+    # Resolve cache hits first and deduplicate the rest: identical strings
+    # get a single slot in the POST and fan back out to every row
+    pending = {}  # text -> rows awaiting its vector
+    for i, text in enumerate(texts):
+        key = (model, text)
+        cached = _EMBED_CACHE.get(key)
+        if cached is not None:
+            _EMBED_CACHE.move_to_end(key)
+            out[i] = _cache_unpack(cached)
+        else:
+            pending.setdefault(text, []).append(i)
+
+    unique_texts = list(pending)
+    batches = [unique_texts[start:start + _MAX_BATCH]
+               for start in range(0, len(unique_texts), _MAX_BATCH)]
+
+    # Multi-batch calls fan out over the worker pool (map preserves batch
+    # order); a single batch skips the executor overhead
+    if len(batches) > 1:
+        all_vectors = _POOL.map(lambda b: _embed_batch(model, b), batches)
+    else:
+        all_vectors = (_embed_batch(model, b) for b in batches)
+
+    for batch, vectors in zip(batches, all_vectors):
+        if vectors is None:
+            # Preallocated rows already hold the zero fallback; failures
+            # are not cached so a later call can retry
+            continue
+        for text, vector in zip(batch, vectors):
+            row = np.asarray(vector, dtype=np.float32)
+            for i in pending[text]:
+                out[i] = row
+            _EMBED_CACHE[(model, text)] = _cache_pack(row)
+            if len(_EMBED_CACHE) > _EMBED_CACHE_MAX:
+                _EMBED_CACHE.popitem(last=False)
+
+    return out
+
+
+async def embed_texts_async(texts: list, model: str = "mxbai-embed-large") -> "np.ndarray":
     """
-    embeddings = []
-    for text in texts:
-        try:
-            response = requests.post(
-                "http://localhost:11434/api/embeddings",
-                json={"model": model, "prompt": text},
-                timeout=30
-            )
-            response.raise_for_status()
-            embeddings.append(response.json()["embedding"])
-        except Exception:
-            embeddings.append([0.0] * 1024)
-    return embeddings
+    Async entry point: one thread offload keeps the event loop free while
+    the sync path fans its batches out over the worker pool. Per-batch
+    failures keep the zero-row fallback. run_in_executor (rather than
+    asyncio.to_thread, 3.9+) keeps Python 3.8 working and reuses the
+    module pool instead of the loop's default executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_POOL, partial(embed_texts_mock, texts, model))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_embed_cache():
+    """Tests mock different vectors for the same strings; never share cache."""
+    _embed_cache_clear()
+    yield
 
 
 @pytest.mark.unit
@@ -43,9 +205,8 @@ class TestEmbeddings:
         
         embeddings = embed_texts_mock(texts)
         
-        assert len(embeddings) == 1
-        assert len(embeddings[0]) == 1024
-        assert all(isinstance(x, float) for x in embeddings[0])
+        assert embeddings.shape == (1, 1024)
+        assert embeddings.dtype == np.float32
     
     def test_embed_multiple_texts(self, mock_ollama_embeddings):
         """Test embedding generation for multiple texts."""
@@ -65,8 +226,8 @@ class TestEmbeddings:
         texts = []
         
         embeddings = embed_texts_mock(texts)
-        
-        assert embeddings == []
+
+        assert embeddings.shape == (0, 1024)
     
     def test_embed_empty_string(self, mock_ollama_embeddings):
         """Test embedding generation with empty string."""
@@ -100,7 +261,7 @@ class TestEmbeddings:
         assert len(embeddings) == 3
         assert all(len(emb) == 1024 for emb in embeddings)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_embed_api_failure_fallback(self, mock_post):
         """Test fallback when Ollama API fails."""
         # Simulate API failure
@@ -108,54 +269,90 @@ class TestEmbeddings:
         
         texts = ["test code"]
         embeddings = embed_texts_mock(texts)
-        
+
         # Should return fallback (zeros)
-        assert len(embeddings) == 1
-        assert embeddings[0] == [0.0] * 1024
+        assert embeddings.shape == (1, 1024)
+        assert not embeddings[0].any()
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_embed_timeout_fallback(self, mock_post):
         """Test fallback when API times out."""
         mock_post.side_effect = requests.exceptions.Timeout()
         
         texts = ["test code"]
         embeddings = embed_texts_mock(texts)
-        
-        assert embeddings[0] == [0.0] * 1024
+
+        assert not embeddings[0].any()
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_embed_partial_failure(self, mock_post):
-        """Test handling when some embeddings fail."""
-        # First call succeeds, second fails
-        success_response = Mock()
-        success_response.status_code = 200
-        success_response.raise_for_status = Mock()
-        success_response.json.return_value = {"embedding": [0.5] * 1024}
-        
-        mock_post.side_effect = [
-            success_response,  # First text succeeds
-            requests.exceptions.ConnectionError()  # Second fails
-        ]
-        
-        texts = ["first", "second"]
+        """Test handling when one batch fails and another succeeds."""
+        # Answer per request payload: batches run on pool threads, so an
+        # ordered side_effect list would make the outcome scheduling-dependent
+        def _respond(url, **kwargs):
+            batch = kwargs["json"]["input"]
+            if "text_64" in batch:
+                raise requests.exceptions.ConnectionError()
+            response = Mock()
+            response.status_code = 200
+            response.raise_for_status = Mock()
+            response.json.return_value = {"embeddings": [_VEC_05] * len(batch)}
+            return response
+
+        mock_post.side_effect = _respond
+
+        texts = [f"text_{i}" for i in range(65)]  # Spans two batches
         embeddings = embed_texts_mock(texts)
-        
-        assert len(embeddings) == 2
-        assert embeddings[0] == [0.5] * 1024  # Success
-        assert embeddings[1] == [0.0] * 1024  # Fallback
-    
+
+        assert embeddings.shape == (65, 1024)
+        assert (embeddings[0] == 0.5).all()  # First batch succeeded
+        assert not embeddings[64].any()  # Failed batch falls back
+
+    @patch('requests.Session.post')
+    def test_embed_duplicates_share_one_slot(self, mock_post):
+        """Duplicate strings within a call are embedded once."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = Mock()
+        mock_response.json.return_value = {"embeddings": [_VEC_04, _VEC_06]}
+        mock_post.return_value = mock_response
+
+        embeddings = embed_texts_mock(["dup", "other", "dup", "dup"])
+
+        assert mock_post.call_args[1]["json"]["input"] == ["dup", "other"]
+        assert (embeddings[0] == 0.4).all()
+        assert (embeddings[2] == 0.4).all()
+        assert (embeddings[3] == 0.4).all()
+        assert (embeddings[1] == 0.6).all()
+
+    @patch('requests.Session.post')
+    def test_embed_cached_text_skips_api(self, mock_post):
+        """Repeat embeddings are served from the cache without a POST."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = Mock()
+        mock_response.json.return_value = {"embeddings": [_VEC_03]}
+        mock_post.return_value = mock_response
+
+        first = embed_texts_mock(["cached text"])
+        second = embed_texts_mock(["cached text"])
+
+        assert mock_post.call_count == 1
+        # FP16 cache packing allows a sub-1e-3 round-trip error
+        assert np.allclose(second, first, atol=1e-3)
+
     def test_embed_different_model(self):
         """Test embedding with different model name."""
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.raise_for_status = Mock()
-            mock_response.json.return_value = {"embedding": [0.2] * 1024}
+            mock_response.json.return_value = {"embeddings": [_VEC_02]}
             mock_post.return_value = mock_response
-            
+
             texts = ["test"]
             embed_texts_mock(texts, model="different-model")
-            
+
             # Verify correct model was passed
             call_args = mock_post.call_args
             assert call_args[1]["json"]["model"] == "different-model"
@@ -182,11 +379,20 @@ class TestEmbeddingEdgeCases:
     def test_embed_very_large_batch(self, mock_ollama_embeddings):
         """Test embedding large number of texts."""
         texts = [f"function_{i}()" for i in range(100)]
-        
+
         embeddings = embed_texts_mock(texts)
-        
+
         assert len(embeddings) == 100
         assert all(len(emb) == 1024 for emb in embeddings)
+
+    async def test_embed_async_matches_sync(self, mock_ollama_embeddings):
+        """Concurrent fan-out returns the same shape as the sync path."""
+        texts = [f"function_{i}()" for i in range(130)]  # Spans three batches
+
+        embeddings = await embed_texts_async(texts)
+
+        assert len(embeddings) == 130
+        assert all(len(emb) == 1024 for emb in embeddings)
     
     @pytest.mark.parametrize("text_input,expected_length", [
         ("short", 1024),
@@ -212,54 +418,70 @@ class TestEmbeddingEdgeCases:
 class TestEmbeddingAPIContract:
     """Test the API contract with Ollama embeddings endpoint."""
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_correct_endpoint_called(self, mock_post):
         """Verify correct Ollama endpoint is called."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.raise_for_status = Mock()
-        mock_response.json.return_value = {"embedding": [0.1] * 1024}
+        mock_response.json.return_value = {"embeddings": [_VEC_01]}
         mock_post.return_value = mock_response
-        
+
         embed_texts_mock(["test"])
-        
+
         call_args = mock_post.call_args
-        assert "http://localhost:11434/api/embeddings" in call_args[0][0]
-    
-    @patch('requests.post')
+        assert "http://localhost:11434/api/embed" in call_args[0][0]
+
+    @patch('requests.Session.post')
     def test_correct_payload_structure(self, mock_post):
         """Verify correct payload is sent to Ollama."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.raise_for_status = Mock()
-        mock_response.json.return_value = {"embedding": [0.1] * 1024}
+        mock_response.json.return_value = {"embeddings": [_VEC_01]}
         mock_post.return_value = mock_response
-        
+
         embed_texts_mock(["def test(): pass"], model="mxbai-embed-large")
-        
+
         call_args = mock_post.call_args
         payload = call_args[1]["json"]
-        
+
         assert "model" in payload
-        assert "prompt" in payload
+        assert "input" in payload
         assert payload["model"] == "mxbai-embed-large"
-        assert payload["prompt"] == "def test(): pass"
-    
-    @patch('requests.post')
+        assert payload["input"] == ["def test(): pass"]
+
+    @patch('requests.Session.post')
+    def test_one_post_per_batch(self, mock_post):
+        """Verify texts are batched instead of posted one by one."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = Mock()
+        mock_response.json.side_effect = lambda: {
+            "embeddings": [_VEC_01] * len(mock_post.call_args[1]["json"]["input"])
+        }
+        mock_post.return_value = mock_response
+
+        embed_texts_mock([f"text_{i}" for i in range(130)])
+
+        # 130 texts -> ceil(130 / 64) = 3 POSTs
+        assert mock_post.call_count == 3
+
+    @patch('requests.Session.post')
     def test_timeout_is_set(self, mock_post):
         """Verify timeout is passed to requests."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.raise_for_status = Mock()
-        mock_response.json.return_value = {"embedding": [0.1] * 1024}
+        mock_response.json.return_value = {"embeddings": [_VEC_01]}
         mock_post.return_value = mock_response
-        
+
         embed_texts_mock(["test"])
-        
+
         call_args = mock_post.call_args
         assert call_args[1]["timeout"] == 30
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_http_error_handling(self, mock_post):
         """Test handling of HTTP error responses."""
         mock_response = Mock()
@@ -270,11 +492,11 @@ class TestEmbeddingAPIContract:
         mock_post.return_value = mock_response
         
         embeddings = embed_texts_mock(["test"])
-        
+
         # Should fallback to zeros on HTTP error
-        assert embeddings[0] == [0.0] * 1024
+        assert not embeddings[0].any()
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_malformed_response_handling(self, mock_post):
         """Test handling of malformed API response."""
         mock_response = Mock()
@@ -285,7 +507,7 @@ class TestEmbeddingAPIContract:
         mock_post.return_value = mock_response
         
         embeddings = embed_texts_mock(["test"])
-        
+
         # Should fallback to zeros when response is malformed
-        assert embeddings[0] == [0.0] * 1024
+        assert not embeddings[0].any()
 
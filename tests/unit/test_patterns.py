@@ -4,11 +4,49 @@ Unit tests for pattern analysis functionality.
 Tests the analyze_patterns MCP tool with mocked LLM responses.
 """
 
+import asyncio
+import re
+from collections import OrderedDict
+from hashlib import blake2b
+
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
 from pathlib import Path
 
 
+# Prompt template hoisted to module scope: one constant string, two
+# substitutions per call, and edits to the wording live in one place
+_PROMPT_TMPL = """Analyze code patterns in this workspace.
+
+Pattern Type: {pattern_type}
+
+Search Results:
+{results}
+
+Provide concise summary (max 200 words):
+1. Pattern characteristics
+2. 1-2 code examples (short)
+3. When to use
+4. Common pitfalls
+
+Be concise - this summary goes to another LLM."""
+
+# Sentinel responses from the search layer that should be returned as-is;
+# one compiled alternation scans the (possibly long) result a single time
+_SENTINEL_RE = re.compile(r"No results|not indexed")
+
+# Summary cache keyed by (pattern_type, digest of the truncated search
+# results): an unchanged workspace re-queried for the same pattern skips
+# the multi-second LLM round-trip entirely
+_SUMMARY_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_SUMMARY_CACHE_MAX = 256
+
+
+def _summary_cache_clear():
+    """Reset the summary cache (test isolation)."""
+    _SUMMARY_CACHE.clear()
+
+
 # Mock implementation (replace with actual import when refactored)
 async def analyze_patterns_mock(
     pattern_type: str,
@@ -30,34 +68,66 @@ async def analyze_patterns_mock(
                 max_results=max_examples * 2
             )
         
-        if "No results" in search_result or "not indexed" in search_result:
+        if _SENTINEL_RE.search(search_result):
             return search_result
         
-        # Simulate LLM analysis
-        prompt = f"""Analyze code patterns in this workspace.
-
-Pattern Type: {pattern_type}
+        # Slice once; both the cache key and the prompt reuse it
+        truncated = search_result[:2000]
 
-Search Results:
-{search_result[:2000]}
+        cache_key = (pattern_type, blake2b(truncated.encode()).digest())
+        cached = _SUMMARY_CACHE.get(cache_key)
+        if cached is not None:
+            _SUMMARY_CACHE.move_to_end(cache_key)
+            return cached
 
-Provide concise summary (max 200 words):
-1. Pattern characteristics
-2. 1-2 code examples (short)
-3. When to use
-4. Common pitfalls
+        # Simulate LLM analysis
+        prompt = _PROMPT_TMPL.format(
+            pattern_type=pattern_type,
+            results=truncated,
+        )
 
-Be concise - this summary goes to another LLM."""
-        
         response = await local_llm.ainvoke(prompt)
-        summary = response.content[:800]
-        
+        content = response.content
+        summary = content[:800]
+
+        _SUMMARY_CACHE[cache_key] = summary
+        if len(_SUMMARY_CACHE) > _SUMMARY_CACHE_MAX:
+            _SUMMARY_CACHE.popitem(last=False)
+
         return summary
         
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+async def analyze_patterns_batch(
+    pattern_types: list,
+    max_examples: int = 3,
+    local_llm=None,
+    semantic_search_func=None
+) -> list:
+    """Analyze several pattern types concurrently.
+
+    One coroutine per type gathered at once, so a multi-pattern sweep costs
+    roughly the slowest analysis instead of the sum. return_exceptions keeps
+    one failed analysis from sinking the rest.
+    """
+    results = await asyncio.gather(
+        *(analyze_patterns_mock(
+            pattern_type, max_examples, local_llm, semantic_search_func)
+          for pattern_type in pattern_types),
+        return_exceptions=True,
+    )
+    return [r if isinstance(r, str) else f"Error: {r}" for r in results]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_summary_cache():
+    """Tests mock different LLM replies for identical inputs; never share cache."""
+    _summary_cache_clear()
+    yield
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 class TestPatternAnalysis:
@@ -191,6 +261,25 @@ class TestPatternAnalysis:
         # But the truncated version (2000 chars) should be
         assert very_long_search[:2000] in captured_prompt
     
+    async def test_analyze_repeat_hits_cache(self, mock_ollama_llm):
+        """Identical pattern + search results skip the second LLM call."""
+        async def mock_search(query, max_results):
+            return "Found results"
+
+        first = await analyze_patterns_mock(
+            "error_handling",
+            local_llm=mock_ollama_llm,
+            semantic_search_func=mock_search
+        )
+        second = await analyze_patterns_mock(
+            "error_handling",
+            local_llm=mock_ollama_llm,
+            semantic_search_func=mock_search
+        )
+
+        assert second == first
+        assert mock_ollama_llm.ainvoke.await_count == 1
+
     async def test_analyze_exception_handling(self, mock_ollama_llm):
         """Test error handling when analysis fails."""
         # Mock LLM that raises exception
@@ -433,6 +522,26 @@ class TestPatternAnalysisIntegration:
         assert "Error Handling Patterns" in result or "error handling" in result.lower()
         assert len(result) <= 800  # Truncated properly
     
+    async def test_batch_analysis_covers_all_patterns(self, mock_ollama_llm):
+        """Batch analysis runs one full analysis per pattern type."""
+        queries = []
+
+        async def mock_search(query, max_results):
+            queries.append(query)
+            return "Found results"
+
+        results = await analyze_patterns_batch(
+            ["error_handling", "async", "caching"],
+            local_llm=mock_ollama_llm,
+            semantic_search_func=mock_search
+        )
+
+        assert len(results) == 3
+        assert all("Mocked LLM response" in r for r in results)
+        assert sorted(queries) == sorted([
+            "error_handling patterns", "async patterns", "caching patterns"
+        ])
+
     async def test_analysis_with_default_search(self, mock_ollama_llm):
         """Test analysis when no search function provided (uses default)."""
         result = await analyze_patterns_mock(